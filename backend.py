@@ -1,23 +1,37 @@
 from fastapi import FastAPI, WebSocket, UploadFile, File, HTTPException, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import asyncio
+import importlib
 import json
-from typing import List, Dict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, List, Dict, Optional
 import os
 from datetime import datetime
 import uuid
 from dotenv import load_dotenv
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.chains import RetrievalQA
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.prompts import PromptTemplate
-from langchain.callbacks.base import BaseCallbackHandler
+from pydantic import BaseModel, Field
+
+from indexing import IndexConfig, chunk_ids, load_dependencies, open_vector_store, split_pdf
+from migration import MigrationError, MigrationManager
+from storage import DocumentStorage, create_storage
+
+# Heavy LangChain/Chroma/GenAI imports are deferred to first use or warm-up
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+# Warm up in the background on startup; stop background work on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+    yield
+    app.state.warm_up_task.cancel()
+    await asyncio.gather(app.state.warm_up_task, return_exceptions=True)
+    await migrations.shutdown()
 
 # Initialising FastAPI 
-app = FastAPI(title="RAG AI Assistant Backend")
+app = FastAPI(title="RAG AI Assistant Backend", lifespan=lifespan)
 
 # Enable CORS for Flask frontend
 app.add_middleware(
@@ -29,87 +43,93 @@ app.add_middleware(
 )
 
 # Global storage
-vector_stores: Dict[str, Chroma] = {}
+vector_stores: Dict[str, "Chroma"] = {}
+index_configs: Dict[str, IndexConfig] = {}
 documents_metadata: List[Dict] = []
-UPLOAD_DIR = "uploaded_pdfs"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+startup_state = {"ready": False, "error": None}
 
 load_dotenv()
 
-# WebSocket streaming callback
-class WebSocketStreamCallback(BaseCallbackHandler):
-    def __init__(self, websocket: WebSocket):
-        self.websocket = websocket
-        
-    async def llm_new_token(self, token: str, **kwargs) -> None:
-        try:
-            await self.websocket.send_json({
-                "type": "token",
-                "content": token
-            })
-        except:
-            pass
+# Original uploads are kept content-addressed for re-indexing
+document_storage: DocumentStorage = create_storage()
+
+# Background re-embedding jobs, swapped into vector_stores when complete
+migrations = MigrationManager(
+    storage=document_storage,
+    vector_stores=vector_stores,
+    index_configs=index_configs,
+    get_documents=lambda: documents_metadata,
+    state_dir=os.environ.get("MIGRATION_STATE_DIR", "migrations"),
+)
+
+class MigrationRequest(BaseModel):
+    embedding_model: Optional[str] = Field(default=None, min_length=1)
+    chunk_size: Optional[int] = Field(default=None, gt=0)
+    chunk_overlap: Optional[int] = Field(default=None, ge=0)
+
+# Whether any recorded document still points to a stored original
+def is_original_referenced(content_hash: str) -> bool:
+    return any(d.get('content_hash') == content_hash for d in documents_metadata)
 
 # Process PDF function
 async def process_pdf(file: UploadFile, user_id: str, api_key: str) -> Dict:
-    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{file.filename}")
-    print("File path: "+file_path, flush=True)
-    
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        print("Content:", flush=True)
-        f.write(content)
+    content = await file.read()
+    content_hash = await document_storage.put(content)
     
     try:
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
-        print("Documents:", flush=True)
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        chunks = text_splitter.split_documents(documents)
+        file_path = await document_storage.local_path(content_hash)
+        print("File path: "+file_path, flush=True)
+        
+        config = index_configs.get(user_id, IndexConfig())
+        chunks = await asyncio.to_thread(split_pdf, file_path, file.filename, config)
         print("Chunks:", flush=True)
         for chunk in chunks:
-            chunk.metadata['source'] = file.filename
             chunk.metadata['upload_time'] = datetime.now().isoformat()
+        doc_id = str(uuid.uuid4())
         
-        embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/gemini-embedding-001",
-            google_api_key=api_key
-        )
-        
-        if user_id not in vector_stores:
-            vector_stores[user_id] = Chroma(
-                embedding_function=embeddings,
-                collection_name=f"user_{user_id}"
+        async with migrations.index_lock(user_id):
+            # A migration may have swapped in new settings while we were splitting
+            if index_configs.get(user_id, IndexConfig()) != config:
+                config = index_configs[user_id]
+                chunks = await asyncio.to_thread(split_pdf, file_path, file.filename, config)
+                for chunk in chunks:
+                    chunk.metadata['upload_time'] = datetime.now().isoformat()
+            
+            if user_id not in vector_stores:
+                vector_stores[user_id] = await asyncio.to_thread(
+                    open_vector_store, migrations.collection_name(user_id), config, api_key
+                )
+            print("Vector store: ", flush=True)
+            await asyncio.to_thread(
+                vector_stores[user_id].add_documents,
+                chunks,
+                ids=chunk_ids(doc_id, len(chunks))
             )
-        print("Vector store: ", flush=True)
-        vector_stores[user_id].add_documents(chunks)
-        print("Vector store after adding documents: ", flush=True)
-        
-        doc_metadata = {
-            "id": str(uuid.uuid4()),
-            "filename": file.filename,
-            "size": len(content),
-            "chunks": len(chunks),
-            "upload_time": datetime.now().isoformat(),
-            "user_id": user_id
-        }
-        documents_metadata.append(doc_metadata)
-        
-        return {
-            "success": True,
-            "metadata": doc_metadata
-        }
+            print("Vector store after adding documents: ", flush=True)
+            
+            doc_metadata = {
+                "id": doc_id,
+                "filename": file.filename,
+                "size": len(content),
+                "content_hash": content_hash,
+                "chunks": len(chunks),
+                "upload_time": datetime.now().isoformat(),
+                "user_id": user_id
+            }
+            documents_metadata.append(doc_metadata)
+            await migrations.save_index(user_id)
     except Exception as e:
         print("Exception: ", e, flush=True)
+        # Don't keep an original that no document or pending upload points to
+        document_storage.release(content_hash)
+        await document_storage.delete_if_unreferenced(content_hash, is_original_referenced)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
     
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    document_storage.release(content_hash)
+    return {
+        "success": True,
+        "metadata": doc_metadata
+    }
 
 # API Endpoints
 @app.post("/api/upload")
@@ -133,9 +153,85 @@ async def get_documents():
 @app.delete("/api/documents/{doc_id}")
 async def delete_document(doc_id: str):
     global documents_metadata
+    removed = [d for d in documents_metadata if d['id'] == doc_id]
     documents_metadata = [d for d in documents_metadata if d['id'] != doc_id]
+    
+    # Only drop the stored original once no document or upload references it
+    for doc in removed:
+        migrations.forget_document(doc['id'])
+        await migrations.save_index(doc['user_id'])
+        await document_storage.delete_if_unreferenced(doc['content_hash'], is_original_referenced)
     return {"success": True}
 
+@app.post("/api/migrations")
+async def start_migration(request: MigrationRequest):
+    user_id = "default"
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    
+    current = index_configs.get(user_id, IndexConfig()).to_dict()
+    overrides = {k: v for k, v in request.dict().items() if v is not None}
+    try:
+        # Overlap is checked against size after merging with current settings
+        config = IndexConfig.from_dict({**current, **overrides})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    try:
+        state = await migrations.start(user_id, config, api_key)
+    except MigrationError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"migration": state}
+
+@app.get("/api/migrations")
+async def get_migration():
+    user_id = "default"
+    state = await migrations.status(user_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="No migration found")
+    return {"migration": state}
+
+# Startup warm-up: load heavy modules off the event loop, then mark ready
+def _load_modules() -> None:
+    load_dependencies(os.environ.get("GOOGLE_API_KEY"))
+    import chat
+
+# Reopen live indexes and resume migrations; needs a persistent Chroma index
+async def restore_indexes():
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not os.environ.get("CHROMA_PERSIST_DIR"):
+        await migrations.abandon_all()
+        return
+    
+    known_ids = {d['id'] for d in documents_metadata}
+    for doc in await migrations.restore(api_key):
+        if doc['id'] not in known_ids:
+            documents_metadata.append(doc)
+    await migrations.resume_all(api_key)
+
+async def warm_up():
+    try:
+        await asyncio.to_thread(_load_modules)
+        await restore_indexes()
+        startup_state["ready"] = True
+        print("Backend ready", flush=True)
+    except Exception as e:
+        print("Warm-up exception: ", e, flush=True)
+        startup_state["error"] = str(e)
+
+# Health probes
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    if not startup_state["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting", "error": startup_state["error"]}
+        )
+    return {"status": "ready"}
+
 # WebSocket endpoint
 @app.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
@@ -159,39 +255,17 @@ async def websocket_chat(websocket: WebSocket):
                     continue
                 
                 try:
-                    stream_callback = WebSocketStreamCallback(websocket)
-                    
-                    llm = ChatGoogleGenerativeAI(
-                        model="gemini-2.5-pro",
-                        google_api_key=api_key,
-                        streaming=True,
-                        callbacks=[stream_callback],
-                        temperature=0.7,
-                        convert_system_message_to_human=True
-                    )
-                    
-                    prompt_template = """Use the following context to answer the question.
-                    Cite source documents when providing information.
-
-                    Context: {context}
-
-                    Question: {question}
-
-                    Answer: (in clean Markdown with proper line breaks and bullet points.)"""
-                    
-                    PROMPT = PromptTemplate(
-                        template=prompt_template,
-                        input_variables=["context", "question"]
-                    )
+                    # Never import LangChain on the event loop thread
+                    if not startup_state["ready"]:
+                        await asyncio.to_thread(importlib.import_module, "chat")
+                    from chat import build_qa_chain
                     
-                    qa_chain = RetrievalQA.from_chain_type(
-                        llm=llm,
-                        chain_type="stuff",
-                        retriever=vector_stores[user_id].as_retriever(
+                    qa_chain = build_qa_chain(
+                        vector_stores[user_id].as_retriever(
                             search_kwargs={"k": 3}
                         ),
-                        chain_type_kwargs={"prompt": PROMPT},
-                        return_source_documents=True
+                        websocket,
+                        api_key
                     )
                     
                     result = await asyncio.to_thread(
@@ -224,7 +298,8 @@ async def websocket_chat(websocket: WebSocket):
     except WebSocketDisconnect:
         pass
 
+# Development entry point with auto-reload; use serve.py in production
 if __name__ == "__main__":
     import uvicorn
     print("Starting FastAPI Backend on http://localhost:8000", flush=True)
-    uvicorn.run("backend:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("backend:app", host="0.0.0.0", port=8000, reload=True)
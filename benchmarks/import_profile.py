@@ -0,0 +1,74 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# What the backend's warm-up task loads after the cheap `import backend`
+WARM_UP_CODE = "import backend, indexing; indexing.load_dependencies(); import chat"
+
+
+# Run code in a fresh interpreter with -X importtime
+def profile_import(code: str) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        lines = [line for line in result.stderr.strip().splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(lines[-1] if lines else f"exit code {result.returncode}")
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the package that pulled them in
+        entries.append((name.rstrip()[1:], int(self_us), int(cumulative_us)))
+    return wall_time, entries
+
+
+def report(title: str, code: str, top: int) -> float:
+    wall_time, entries = profile_import(code)
+    top_level = [e for e in entries if not e[0].startswith(" ")]
+
+    print(f"== {title}: {code}")
+    print(f"Interpreter start + run: {wall_time * 1000:.1f} ms")
+    print(f"Modules imported: {len(entries)}")
+    print(f"Top-level import time: {sum(e[2] for e in top_level) / 1000:.1f} ms")
+    print()
+    print(f"{'cumulative ms':>14}  {'self ms':>8}  module")
+    for name, self_us, cumulative_us in sorted(top_level, key=lambda e: e[2], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name.strip()}")
+    print()
+    return wall_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the backend")
+    parser.add_argument("--module", default="backend")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--skip-warm-up", action="store_true",
+                        help="Only profile the module import, not the deferred warm-up imports")
+    args = parser.parse_args()
+
+    import_time = report("Import", f"import {args.module}", args.top)
+    if args.skip_warm_up:
+        return
+
+    # The cost moved out of `import backend` still has to be paid before /readyz
+    warm_up_time = report("Import + warm-up", WARM_UP_CODE, args.top)
+    print(f"Time to serve /healthz: {import_time * 1000:.1f} ms")
+    print(f"Time to serve /readyz:  {warm_up_time * 1000:.1f} ms (excluding index restore)")
+
+
+if __name__ == "__main__":
+    main()
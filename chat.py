@@ -0,0 +1,59 @@
+from fastapi import WebSocket
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.chains import RetrievalQA
+from langchain.prompts import PromptTemplate
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.retrievers import BaseRetriever
+
+# Imported on the first question (or by the startup warm-up task), since
+# LangChain and the GenAI SDK are slow to load
+
+# WebSocket streaming callback
+class WebSocketStreamCallback(BaseCallbackHandler):
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        
+    async def llm_new_token(self, token: str, **kwargs) -> None:
+        try:
+            await self.websocket.send_json({
+                "type": "token",
+                "content": token
+            })
+        except:
+            pass
+
+# Build the question answering chain for one question
+def build_qa_chain(retriever: BaseRetriever, websocket: WebSocket, api_key: str) -> RetrievalQA:
+    stream_callback = WebSocketStreamCallback(websocket)
+    
+    llm = ChatGoogleGenerativeAI(
+        model="gemini-2.5-pro",
+        google_api_key=api_key,
+        streaming=True,
+        callbacks=[stream_callback],
+        temperature=0.7,
+        convert_system_message_to_human=True
+    )
+    
+    prompt_template = """Use the following context to answer the question.
+    Cite source documents when providing information.
+
+    Context: {context}
+
+    Question: {question}
+
+    Answer: (in clean Markdown with proper line breaks and bullet points.)"""
+    
+    PROMPT = PromptTemplate(
+        template=prompt_template,
+        input_variables=["context", "question"]
+    )
+    
+    return RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        retriever=retriever,
+        chain_type_kwargs={"prompt": PROMPT},
+        return_source_documents=True
+    )
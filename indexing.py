@@ -0,0 +1,98 @@
+import os
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+# LangChain, Chroma, the GenAI SDK and PyPDF are slow to import, so they are
+# only loaded on first use (or by the startup warm-up task)
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+    from langchain_core.documents import Document
+
+DEFAULT_EMBEDDING_MODEL = "models/gemini-embedding-001"
+
+# Heavy modules imported lazily by this module. The langchain_community
+# packages resolve Chroma and PyPDFLoader lazily, and those in turn only
+# import chromadb and pypdf when used, so all of them are listed explicitly.
+HEAVY_MODULES = [
+    "langchain.text_splitter",
+    "langchain_community.vectorstores.chroma",
+    "langchain_community.document_loaders.pdf",
+    "langchain_google_genai",
+    "chromadb",
+    "pypdf",
+]
+
+
+# Settings that determine how a collection was built
+@dataclass
+class IndexConfig:
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+
+    def __post_init__(self):
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({self.chunk_overlap}) must be smaller than chunk_size ({self.chunk_size})"
+            )
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "IndexConfig":
+        return cls(**data)
+
+
+# Import everything up front (blocking, run it in a worker thread)
+def load_dependencies(api_key: Optional[str] = None) -> None:
+    import importlib
+
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+    # Building one client also pays for the GenAI SDK's own setup
+    if api_key:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        GoogleGenerativeAIEmbeddings(model=DEFAULT_EMBEDDING_MODEL, google_api_key=api_key)
+
+
+# Load and chunk a stored PDF (blocking, run it in a worker thread)
+def split_pdf(file_path: str, filename: str, config: IndexConfig) -> List["Document"]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.document_loaders import PyPDFLoader
+
+    loader = PyPDFLoader(file_path)
+    documents = loader.load()
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=config.chunk_size,
+        chunk_overlap=config.chunk_overlap,
+        length_function=len,
+    )
+    chunks = text_splitter.split_documents(documents)
+    for chunk in chunks:
+        chunk.metadata['source'] = filename
+    return chunks
+
+
+# Stable ids make re-adding a document's chunks idempotent
+def chunk_ids(doc_id: str, count: int) -> List[str]:
+    return [f"{doc_id}-{i}" for i in range(count)]
+
+
+def open_vector_store(collection_name: str, config: IndexConfig, api_key: str) -> "Chroma":
+    from langchain_community.vectorstores import Chroma
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    embeddings = GoogleGenerativeAIEmbeddings(
+        model=config.embedding_model,
+        google_api_key=api_key
+    )
+    # Leave CHROMA_PERSIST_DIR unset for an in-memory index; set it so
+    # partially built migration collections survive a restart
+    return Chroma(
+        embedding_function=embeddings,
+        collection_name=collection_name,
+        persist_directory=os.environ.get("CHROMA_PERSIST_DIR")
+    )
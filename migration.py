@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
+
+from indexing import IndexConfig, chunk_ids, open_vector_store, split_pdf
+from storage import DocumentStorage
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+
+class MigrationError(Exception):
+    pass
+
+
+class MigrationManager:
+    """Rebuilds a tenant's collection in the background and swaps it in.
+
+    Progress is checkpointed to `state_dir/<user_id>.json` after every
+    document, so an interrupted job picks up where it stopped. The live
+    collection, its settings and its documents are recorded in
+    `state_dir/indexes/<user_id>.json` so they can be restored on startup.
+    """
+
+    def __init__(
+        self,
+        storage: DocumentStorage,
+        vector_stores: Dict[str, "Chroma"],
+        index_configs: Dict[str, IndexConfig],
+        get_documents: Callable[[], List[Dict]],
+        state_dir: str = "migrations",
+        batch_size: int = 32,
+        throttle_seconds: float = 0.5,
+        retire_delay_seconds: float = 60.0,
+    ):
+        self.storage = storage
+        self.vector_stores = vector_stores
+        self.index_configs = index_configs
+        self.get_documents = get_documents
+        self.state_dir = state_dir
+        self.batch_size = batch_size
+        self.throttle_seconds = throttle_seconds
+        self.retire_delay_seconds = retire_delay_seconds
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.deleted_ids: Set[str] = set()
+        self.collections: Dict[str, str] = {}
+        self.index_dir = os.path.join(self.state_dir, "indexes")
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    # Held while writing to, or swapping, a tenant's live index
+    def index_lock(self, user_id: str) -> asyncio.Lock:
+        if user_id not in self.locks:
+            self.locks[user_id] = asyncio.Lock()
+        return self.locks[user_id]
+
+    def is_running(self, user_id: str) -> bool:
+        task = self.tasks.get(user_id)
+        return task is not None and not task.done()
+
+    # Called when a document is deleted so running jobs stop indexing it
+    def forget_document(self, doc_id: str) -> None:
+        self.deleted_ids.add(doc_id)
+
+    # Collection currently serving a tenant's questions
+    def collection_name(self, user_id: str) -> str:
+        return self.collections.get(user_id, f"user_{user_id}")
+
+    # Checkpoint persistence
+    def _state_path(self, user_id: str) -> str:
+        return os.path.join(self.state_dir, f"{user_id}.json")
+
+    def _index_path(self, user_id: str) -> str:
+        return os.path.join(self.index_dir, f"{user_id}.json")
+
+    def _write_json(self, path: str, data: str) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path: str) -> Optional[Dict]:
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    async def _save(self, state: Dict) -> None:
+        state['updated_at'] = datetime.now().isoformat()
+        # Serialise on the loop so the job can't mutate state mid-write
+        data = json.dumps(state, indent=2)
+        await asyncio.to_thread(self._write_json, self._state_path(state['user_id']), data)
+
+    async def status(self, user_id: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._read_json, self._state_path(user_id))
+
+    # Record the live index so a restart can reopen it
+    async def save_index(self, user_id: str) -> None:
+        record = {
+            "user_id": user_id,
+            "collection_name": self.collection_name(user_id),
+            "config": self.index_configs.get(user_id, IndexConfig()).to_dict(),
+            "documents": [d for d in self.get_documents() if d['user_id'] == user_id],
+        }
+        data = json.dumps(record, indent=2)
+        await asyncio.to_thread(self._write_json, self._index_path(user_id), data)
+
+    async def restore(self, api_key: str) -> List[Dict]:
+        """Reopen every recorded live index; returns the documents it holds."""
+        documents = []
+        for name in os.listdir(self.index_dir):
+            if not name.endswith(".json"):
+                continue
+            record = await asyncio.to_thread(self._read_json, os.path.join(self.index_dir, name))
+            user_id = record['user_id']
+            config = IndexConfig.from_dict(record['config'])
+            self.vector_stores[user_id] = await asyncio.to_thread(
+                open_vector_store, record['collection_name'], config, api_key
+            )
+            self.index_configs[user_id] = config
+            self.collections[user_id] = record['collection_name']
+            documents.extend(record['documents'])
+        return documents
+
+    # Without a persistent index there is nothing to resume after a restart
+    async def abandon_all(self) -> None:
+        for state in await self._running_states():
+            print("Abandoning migration: ", state['job_id'], flush=True)
+            state['status'] = "failed"
+            state['error'] = "Interrupted by a restart without CHROMA_PERSIST_DIR"
+            await self._save(state)
+
+    async def _running_states(self) -> List[Dict]:
+        states = []
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".json"):
+                continue
+            state = await self.status(name[:-len(".json")])
+            if state and state['status'] == "running" and not self.is_running(state['user_id']):
+                states.append(state)
+        return states
+
+    def _tenant_documents(self, user_id: str) -> List[Dict]:
+        return [
+            {
+                "id": d['id'],
+                "filename": d['filename'],
+                "content_hash": d['content_hash'],
+                "upload_time": d['upload_time'],
+            }
+            for d in self.get_documents()
+            if d['user_id'] == user_id and d.get('content_hash')
+        ]
+
+    # Job control
+    async def start(self, user_id: str, config: IndexConfig, api_key: str) -> Dict:
+        if self.is_running(user_id):
+            raise MigrationError(f"A migration is already running for {user_id}")
+
+        job_id = uuid.uuid4().hex[:12]
+        state = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "status": "running",
+            "config": config.to_dict(),
+            "collection_name": f"user_{user_id}_{job_id}",
+            "documents": self._tenant_documents(user_id),
+            "completed": {},
+            "error": None,
+            "started_at": datetime.now().isoformat(),
+        }
+        # Register the task before the first await so a concurrent start sees it
+        self._launch(state, api_key)
+        await self._save(state)
+        return state
+
+    async def resume_all(self, api_key: str) -> None:
+        for state in await self._running_states():
+            print("Resuming migration: ", state['job_id'], flush=True)
+            self._launch(state, api_key)
+
+    def _launch(self, state: Dict, api_key: str) -> None:
+        self.tasks[state['user_id']] = asyncio.create_task(self._run(state, api_key))
+
+    # Cancel running jobs; their checkpoints stay "running" and resume later
+    async def shutdown(self) -> None:
+        tasks = [task for task in self.tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Job body
+    async def _run(self, state: Dict, api_key: str) -> None:
+        user_id = state['user_id']
+        config = IndexConfig.from_dict(state['config'])
+        try:
+            store = await asyncio.to_thread(
+                open_vector_store, state['collection_name'], config, api_key
+            )
+
+            # An in-memory collection comes back empty after a restart, so
+            # the checkpoint can't be trusted and everything is re-embedded
+            count = await asyncio.to_thread(store._collection.count)
+            if count < sum(state['completed'].values()):
+                print("Migration checkpoint ahead of index, restarting: ", state['job_id'], flush=True)
+                state['completed'] = {}
+
+            for doc in list(state['documents']):
+                if doc['id'] not in state['completed']:
+                    await self._migrate_document(store, state, doc, config)
+
+            # Pick up documents uploaded while the rebuild was running
+            await self._catch_up(store, state, config)
+
+            await self._validate(store, state)
+
+            async with self.index_lock(user_id):
+                await self._catch_up(store, state, config)
+                await self._purge_deleted(store, state)
+                await self._check_count(store, state)
+                old_store = self.vector_stores.get(user_id)
+                self.vector_stores[user_id] = store
+                self.index_configs[user_id] = config
+                self.collections[user_id] = state['collection_name']
+                for doc in self.get_documents():
+                    if doc['id'] in state['completed']:
+                        doc['chunks'] = state['completed'][doc['id']]
+                state['status'] = "completed"
+                await self._save(state)
+                await self.save_index(user_id)
+            print("Migration swapped in: ", state['job_id'], flush=True)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Migration exception: ", e, flush=True)
+            state['status'] = "failed"
+            state['error'] = str(e)
+            await self._save(state)
+            return
+
+        if old_store is not None and old_store is not store:
+            await self._retire(old_store)
+
+    # Give in-flight questions on the old retriever time to finish, then drop it
+    async def _retire(self, old_store: "Chroma") -> None:
+        try:
+            await asyncio.sleep(self.retire_delay_seconds)
+            await asyncio.to_thread(old_store.delete_collection)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Exception retiring old collection: ", e, flush=True)
+
+    async def _catch_up(self, store: "Chroma", state: Dict, config: IndexConfig) -> None:
+        known = {doc['id'] for doc in state['documents']}
+        for doc in self._tenant_documents(state['user_id']):
+            if doc['id'] not in known:
+                state['documents'].append(doc)
+                await self._migrate_document(store, state, doc, config)
+
+    def _is_deleted(self, doc_id: str) -> bool:
+        live_ids = {d['id'] for d in self.get_documents()}
+        return doc_id in self.deleted_ids or doc_id not in live_ids
+
+    def _drop_document(self, state: Dict, doc_id: str) -> None:
+        state['documents'] = [d for d in state['documents'] if d['id'] != doc_id]
+        state['completed'].pop(doc_id, None)
+
+    async def _migrate_document(self, store: "Chroma", state: Dict, doc: Dict, config: IndexConfig) -> None:
+        # Skip documents deleted since the job started
+        if self._is_deleted(doc['id']):
+            print("Migration skipping deleted document: ", doc['id'], flush=True)
+            self._drop_document(state, doc['id'])
+            await self._save(state)
+            return
+
+        # A live document without its original must not vanish from the index
+        if not await self.storage.exists(doc['content_hash']):
+            raise MigrationError(f"Original of document {doc['id']} is missing")
+
+        file_path = await self.storage.local_path(doc['content_hash'])
+        chunks = await asyncio.to_thread(split_pdf, file_path, doc['filename'], config)
+        for chunk in chunks:
+            chunk.metadata['upload_time'] = doc['upload_time']
+        ids = chunk_ids(doc['id'], len(chunks))
+
+        # Embed in small batches and yield between them to spare live traffic
+        for start in range(0, len(chunks), self.batch_size):
+            end = start + self.batch_size
+            await asyncio.to_thread(store.add_documents, chunks[start:end], ids=ids[start:end])
+            await asyncio.sleep(self.throttle_seconds)
+
+        state['completed'][doc['id']] = len(chunks)
+        await self._save(state)
+
+    # Remove chunks of documents deleted after they were migrated
+    async def _purge_deleted(self, store: "Chroma", state: Dict) -> None:
+        for doc_id, count in list(state['completed'].items()):
+            if self._is_deleted(doc_id):
+                if count:
+                    await asyncio.to_thread(store.delete, ids=chunk_ids(doc_id, count))
+                self._drop_document(state, doc_id)
+
+    async def _check_count(self, store: "Chroma", state: Dict) -> None:
+        expected = sum(state['completed'].values())
+        count = await asyncio.to_thread(store._collection.count)
+        if count != expected:
+            raise MigrationError(f"New index has {count} chunks, expected {expected}")
+
+    async def _validate(self, store: "Chroma", state: Dict) -> None:
+        await self._check_count(store, state)
+
+        expected = sum(state['completed'].values())
+        if expected:
+            probe = state['documents'][0]['filename']
+            results = await asyncio.to_thread(store.similarity_search, probe, k=1)
+            if not results:
+                raise MigrationError("New index returned no results for a probe query")
@@ -0,0 +1,12 @@
+import os
+
+import uvicorn
+
+# Production entry point: no auto-reload, heavy imports happen in the
+# backend's warm-up task so the server starts accepting connections at once.
+# A single worker is used because documents and indexes live in process memory.
+if __name__ == "__main__":
+    host = os.environ.get("HOST", "0.0.0.0")
+    port = int(os.environ.get("PORT", "8000"))
+    print(f"Starting FastAPI Backend on http://{host}:{port}", flush=True)
+    uvicorn.run("backend:app", host=host, port=port, reload=False, workers=1)
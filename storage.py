@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+
+# Content hashing
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+# Base storage interface
+class DocumentStorage(ABC):
+    """Content-addressed store for original uploads, keyed by SHA-256 digest.
+
+    `put` takes a pending reference on the digest that the caller must
+    `release` once the upload is recorded (or has failed), so a concurrent
+    delete of the same bytes can't remove a blob that is still being indexed.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _lock(self, digest: str) -> asyncio.Lock:
+        if digest not in self._locks:
+            self._locks[digest] = asyncio.Lock()
+        return self._locks[digest]
+
+    async def put(self, content: bytes) -> str:
+        digest = await asyncio.to_thread(content_digest, content)
+        async with self._lock(digest):
+            self._pending[digest] = self._pending.get(digest, 0) + 1
+            try:
+                await self._store(digest, content)
+            except BaseException:
+                self.release(digest)
+                raise
+        return digest
+
+    def release(self, digest: str) -> None:
+        count = self._pending.get(digest, 0) - 1
+        if count > 0:
+            self._pending[digest] = count
+        else:
+            self._pending.pop(digest, None)
+
+    async def delete_if_unreferenced(self, digest: str, is_referenced: Callable[[str], bool]) -> bool:
+        """Delete the blob unless an upload or `is_referenced(digest)` still holds it."""
+        async with self._lock(digest):
+            if self._pending.get(digest) or is_referenced(digest):
+                return False
+            await self.delete(digest)
+            return True
+
+    @abstractmethod
+    async def _store(self, digest: str, content: bytes) -> None:
+        pass
+
+    @abstractmethod
+    async def exists(self, digest: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def get(self, digest: str) -> bytes:
+        pass
+
+    @abstractmethod
+    async def delete(self, digest: str) -> None:
+        pass
+
+    @abstractmethod
+    async def local_path(self, digest: str) -> str:
+        """Path on local disk that parser workers can open directly."""
+
+
+# Local disk backend
+class LocalDocumentStorage(DocumentStorage):
+    def __init__(self, root: str):
+        super().__init__()
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _write(self, digest: str, content: bytes) -> None:
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read(self, digest: str) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+    def _remove(self, digest: str) -> None:
+        path = self._path(digest)
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def _store(self, digest: str, content: bytes) -> None:
+        await asyncio.to_thread(self._write, digest, content)
+
+    async def exists(self, digest: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self._path(digest))
+
+    async def get(self, digest: str) -> bytes:
+        return await asyncio.to_thread(self._read, digest)
+
+    async def delete(self, digest: str) -> None:
+        await asyncio.to_thread(self._remove, digest)
+
+    async def local_path(self, digest: str) -> str:
+        if not await self.exists(digest):
+            raise FileNotFoundError(digest)
+        return self._path(digest)
+
+
+# S3-compatible backend (AWS S3, MinIO, LocalStack, ...)
+class S3DocumentStorage(DocumentStorage):
+    def __init__(
+        self,
+        bucket: str,
+        cache_dir: str,
+        prefix: str = "documents/",
+        endpoint_url: Optional[str] = None,
+    ):
+        super().__init__()
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self._client = None
+        # Parsers need a real file, so downloaded blobs are cached locally
+        self.cache = LocalDocumentStorage(cache_dir)
+
+    # boto3 is slow to import, so the client is built on first use
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+        return self._client
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}{digest[:2]}/{digest}"
+
+    def _head(self, digest: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(digest))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _upload(self, digest: str, content: bytes) -> None:
+        if self._head(digest):
+            return
+        self.client.put_object(Bucket=self.bucket, Key=self._key(digest), Body=content)
+
+    def _download(self, digest: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=self._key(digest))
+        return response["Body"].read()
+
+    async def _store(self, digest: str, content: bytes) -> None:
+        await self.cache._store(digest, content)
+        await asyncio.to_thread(self._upload, digest, content)
+
+    async def exists(self, digest: str) -> bool:
+        return await asyncio.to_thread(self._head, digest)
+
+    async def get(self, digest: str) -> bytes:
+        if await self.cache.exists(digest):
+            return await self.cache.get(digest)
+        return await asyncio.to_thread(self._download, digest)
+
+    async def delete(self, digest: str) -> None:
+        await asyncio.to_thread(
+            self.client.delete_object, Bucket=self.bucket, Key=self._key(digest)
+        )
+        await self.cache.delete(digest)
+
+    async def local_path(self, digest: str) -> str:
+        if not await self.cache.exists(digest):
+            content = await asyncio.to_thread(self._download, digest)
+            await self.cache._store(digest, content)
+        return await self.cache.local_path(digest)
+
+
+# Backend selection from environment
+def create_storage() -> DocumentStorage:
+    root = os.environ.get("DOCUMENT_STORE_DIR", "document_store")
+    backend = os.environ.get("DOCUMENT_STORAGE", "local").lower()
+
+    if backend == "s3":
+        return S3DocumentStorage(
+            bucket=os.environ["DOCUMENT_STORE_BUCKET"],
+            cache_dir=os.path.join(root, "cache"),
+            prefix=os.environ.get("DOCUMENT_STORE_PREFIX", "documents/"),
+            endpoint_url=os.environ.get("DOCUMENT_STORE_ENDPOINT_URL"),
+        )
+    if backend == "local":
+        return LocalDocumentStorage(root)
+    raise ValueError(f"Unknown DOCUMENT_STORAGE backend: {backend}")
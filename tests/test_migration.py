@@ -0,0 +1,246 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import migration
+from indexing import IndexConfig
+from migration import MigrationError, MigrationManager
+from storage import LocalDocumentStorage
+
+
+# In-memory stand-in for a Chroma collection
+class FakeStore:
+    def __init__(self):
+        self.ids = set()
+        self._collection = SimpleNamespace(count=lambda: len(self.ids))
+
+    def add_documents(self, chunks, ids):
+        self.ids.update(ids)
+
+    def delete(self, ids):
+        self.ids.difference_update(ids)
+
+    def similarity_search(self, query, k):
+        return [SimpleNamespace(metadata={})] if self.ids else []
+
+    def delete_collection(self):
+        self.ids.clear()
+
+
+def fake_split_pdf(file_path, filename, config):
+    with open(file_path, "rb") as f:
+        count = len(f.read().split())
+    return [SimpleNamespace(metadata={'source': filename}) for _ in range(count)]
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    opened = {}
+
+    def open_store(collection_name, config, api_key):
+        return opened.setdefault(collection_name, FakeStore())
+
+    monkeypatch.setattr(migration, "open_vector_store", open_store)
+    monkeypatch.setattr(migration, "split_pdf", fake_split_pdf)
+    return opened
+
+
+def make_manager(tmp_path, documents, vector_stores=None):
+    return MigrationManager(
+        storage=LocalDocumentStorage(str(tmp_path / "store")),
+        vector_stores={} if vector_stores is None else vector_stores,
+        index_configs={},
+        get_documents=lambda: documents,
+        state_dir=str(tmp_path / "migrations"),
+        throttle_seconds=0,
+        retire_delay_seconds=0,
+    )
+
+
+def add_document(manager, documents, doc_id, content):
+    content_hash = asyncio.run(manager.storage.put(content))
+    documents.append({
+        "id": doc_id,
+        "filename": f"{doc_id}.pdf",
+        "content_hash": content_hash,
+        "upload_time": "2026-01-01T00:00:00",
+        "user_id": "default",
+    })
+
+
+def test_migration_swaps_in_new_store(tmp_path, stores):
+    documents = []
+    vector_stores = {"default": FakeStore()}
+    manager = make_manager(tmp_path, documents, vector_stores)
+    add_document(manager, documents, "a", b"one two three")
+
+    async def run():
+        state = await manager.start("default", IndexConfig(chunk_size=500, chunk_overlap=50), "key")
+        await manager.tasks["default"]
+        return state
+
+    state = asyncio.run(run())
+    saved = asyncio.run(manager.status("default"))
+
+    assert saved['status'] == "completed"
+    assert vector_stores["default"] is stores[state['collection_name']]
+    assert manager.index_configs["default"].chunk_size == 500
+    assert documents[0]['chunks'] == 3
+
+
+def test_resume_with_empty_store_re_embeds(tmp_path, stores):
+    documents = []
+    manager = make_manager(tmp_path, documents)
+    add_document(manager, documents, "a", b"one two")
+    add_document(manager, documents, "b", b"three four five")
+
+    # Checkpoint claims "a" is done, but the in-memory collection is gone
+    state = {
+        "job_id": "job1",
+        "user_id": "default",
+        "status": "running",
+        "config": IndexConfig().to_dict(),
+        "collection_name": "user_default_job1",
+        "documents": [{k: d[k] for k in ("id", "filename", "content_hash", "upload_time")} for d in documents],
+        "completed": {"a": 2},
+        "error": None,
+    }
+    with open(tmp_path / "migrations" / "default.json", "w") as f:
+        json.dump(state, f)
+
+    async def run():
+        await manager.resume_all("key")
+        await manager.tasks["default"]
+
+    asyncio.run(run())
+    saved = asyncio.run(manager.status("default"))
+
+    assert saved['status'] == "completed"
+    assert saved['completed'] == {"a": 2, "b": 3}
+    assert stores["user_default_job1"]._collection.count() == 5
+
+
+def test_concurrent_start_is_rejected(tmp_path, stores):
+    manager = make_manager(tmp_path, [])
+
+    async def run():
+        return await asyncio.gather(
+            manager.start("default", IndexConfig(), "key"),
+            manager.start("default", IndexConfig(), "key"),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    assert sum(isinstance(r, MigrationError) for r in results) == 1
+
+
+def test_deleted_document_is_skipped(tmp_path, stores):
+    documents = []
+    manager = make_manager(tmp_path, documents)
+    add_document(manager, documents, "a", b"one two")
+    add_document(manager, documents, "b", b"three")
+
+    async def run():
+        await manager.start("default", IndexConfig(), "key")
+        # Delete "b" and its blob before the job gets to it
+        removed = documents.pop()
+        manager.forget_document(removed['id'])
+        await manager.storage.delete(removed['content_hash'])
+        await manager.tasks["default"]
+
+    asyncio.run(run())
+    saved = asyncio.run(manager.status("default"))
+
+    assert saved['status'] == "completed"
+    assert [d['id'] for d in saved['documents']] == ["a"]
+    assert saved['completed'] == {"a": 2}
+
+
+def test_document_deleted_after_migrating_is_purged(tmp_path, stores):
+    documents = []
+    manager = make_manager(tmp_path, documents)
+    add_document(manager, documents, "a", b"one two")
+    add_document(manager, documents, "b", b"three four five")
+
+    original_catch_up = manager._catch_up
+
+    # Delete "a" once its chunks are already in the new collection
+    async def catch_up_then_delete(store, state, config):
+        if "a" in state['completed'] and documents[0]['id'] == "a":
+            manager.forget_document(documents.pop(0)['id'])
+        await original_catch_up(store, state, config)
+
+    manager._catch_up = catch_up_then_delete
+
+    async def run():
+        state = await manager.start("default", IndexConfig(), "key")
+        await manager.tasks["default"]
+        return state
+
+    state = asyncio.run(run())
+    saved = asyncio.run(manager.status("default"))
+
+    assert saved['status'] == "completed"
+    assert saved['completed'] == {"b": 3}
+    assert stores[state['collection_name']].ids == {"b-0", "b-1", "b-2"}
+
+
+def test_missing_original_fails_and_keeps_old_index(tmp_path, stores):
+    documents = []
+    old_store = FakeStore()
+    vector_stores = {"default": old_store}
+    manager = make_manager(tmp_path, documents, vector_stores)
+    add_document(manager, documents, "a", b"one two")
+    asyncio.run(manager.storage.delete(documents[0]['content_hash']))
+
+    async def run():
+        await manager.start("default", IndexConfig(), "key")
+        await manager.tasks["default"]
+
+    asyncio.run(run())
+    saved = asyncio.run(manager.status("default"))
+
+    assert saved['status'] == "failed"
+    assert "missing" in saved['error']
+    assert vector_stores["default"] is old_store
+
+
+def test_restore_reopens_swapped_index(tmp_path, stores):
+    documents = []
+    manager = make_manager(tmp_path, documents)
+    add_document(manager, documents, "a", b"one two")
+
+    async def run():
+        state = await manager.start("default", IndexConfig(chunk_size=500, chunk_overlap=50), "key")
+        await manager.tasks["default"]
+        return state
+
+    state = asyncio.run(run())
+
+    # A fresh process knows nothing until it restores the recorded index
+    restarted = make_manager(tmp_path, [])
+    restored = asyncio.run(restarted.restore("key"))
+
+    assert [d['id'] for d in restored] == ["a"]
+    assert restarted.collection_name("default") == state['collection_name']
+    assert restarted.vector_stores["default"] is stores[state['collection_name']]
+    assert restarted.index_configs["default"].chunk_size == 500
+
+
+def test_abandon_marks_running_jobs_failed(tmp_path, stores):
+    manager = make_manager(tmp_path, [])
+    state = {"job_id": "job1", "user_id": "default", "status": "running"}
+    with open(tmp_path / "migrations" / "default.json", "w") as f:
+        json.dump(state, f)
+
+    asyncio.run(manager.abandon_all())
+
+    assert asyncio.run(manager.status("default"))['status'] == "failed"
+
+
+def test_overlap_must_be_smaller_than_size():
+    with pytest.raises(ValueError):
+        IndexConfig(chunk_size=100, chunk_overlap=200)
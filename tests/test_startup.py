@@ -0,0 +1,57 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["langchain", "langchain_community", "langchain_google_genai", "chromadb", "pypdf"]
+
+
+@pytest.fixture
+def backend_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("DOCUMENT_STORE_DIR", str(tmp_path / "document_store"))
+    monkeypatch.setenv("MIGRATION_STATE_DIR", str(tmp_path / "migrations"))
+    monkeypatch.delenv("CHROMA_PERSIST_DIR", raising=False)
+    return tmp_path
+
+
+def test_backend_import_is_lazy(backend_env):
+    pytest.importorskip("fastapi")
+    code = (
+        "import sys, backend\n"
+        f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(loaded)\n"
+        "sys.exit(1 if loaded else 0)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_health_and_readiness(backend_env):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    backend = importlib.import_module("backend")
+    # Without entering the client the lifespan (and warm-up) never runs
+    client = TestClient(backend.app)
+    backend.startup_state["ready"] = False
+
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/readyz").status_code == 503
+
+    backend.startup_state["ready"] = True
+    try:
+        assert client.get("/readyz").status_code == 200
+    finally:
+        backend.startup_state["ready"] = False
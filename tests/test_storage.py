@@ -0,0 +1,90 @@
+import asyncio
+import os
+
+import pytest
+
+from storage import DocumentStorage, LocalDocumentStorage, content_digest
+
+
+def test_put_returns_content_digest(tmp_path):
+    storage = LocalDocumentStorage(str(tmp_path))
+    digest = asyncio.run(storage.put(b"%PDF-1.4 hello"))
+
+    assert digest == content_digest(b"%PDF-1.4 hello")
+    assert asyncio.run(storage.get(digest)) == b"%PDF-1.4 hello"
+
+
+def test_put_deduplicates_identical_content(tmp_path):
+    storage = LocalDocumentStorage(str(tmp_path))
+    first = asyncio.run(storage.put(b"same bytes"))
+    second = asyncio.run(storage.put(b"same bytes"))
+
+    assert first == second
+    blobs = [name for _, _, files in os.walk(tmp_path) for name in files]
+    assert blobs == [first]
+
+
+def test_local_path_points_at_stored_blob(tmp_path):
+    storage = LocalDocumentStorage(str(tmp_path))
+    digest = asyncio.run(storage.put(b""))
+    path = asyncio.run(storage.local_path(digest))
+
+    with open(path, "rb") as f:
+        assert f.read() == b""
+
+
+def test_delete_removes_blob(tmp_path):
+    storage = LocalDocumentStorage(str(tmp_path))
+    digest = asyncio.run(storage.put(b"to delete"))
+    asyncio.run(storage.delete(digest))
+
+    assert not asyncio.run(storage.exists(digest))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(storage.local_path(digest))
+    # Deleting twice is a no-op
+    asyncio.run(storage.delete(digest))
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        DocumentStorage()
+
+
+def test_pending_upload_keeps_blob_alive(tmp_path):
+    storage = LocalDocumentStorage(str(tmp_path))
+
+    async def run():
+        # Two uploads of the same bytes are in flight; the first one fails
+        first = await storage.put(b"shared")
+        second = await storage.put(b"shared")
+        storage.release(first)
+        deleted = await storage.delete_if_unreferenced(first, lambda digest: False)
+        assert not deleted
+        assert await storage.exists(second)
+
+        # Once the second upload is recorded, the blob is referenced
+        storage.release(second)
+        assert not await storage.delete_if_unreferenced(second, lambda digest: True)
+        assert await storage.exists(second)
+
+        # With no uploads and no references left it can go
+        assert await storage.delete_if_unreferenced(second, lambda digest: False)
+        assert not await storage.exists(second)
+
+    asyncio.run(run())
+
+
+def test_concurrent_put_and_delete_keep_blob(tmp_path):
+    storage = LocalDocumentStorage(str(tmp_path))
+
+    async def run():
+        digest = await storage.put(b"racing")
+        storage.release(digest)
+        # A new upload of the same bytes races a delete of the old document
+        new_digest, _ = await asyncio.gather(
+            storage.put(b"racing"),
+            storage.delete_if_unreferenced(digest, lambda d: False),
+        )
+        assert await storage.exists(new_digest)
+
+    asyncio.run(run())